@@ -8,36 +8,26 @@ make_dataset.py 制作股票日线数据集
     @Copyright Copyright Shihong Wang (c) 2025 with GNU Public License V3.0
 """
 
-import itertools
-
 # Standard Library
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # Third-Party Library
-import pandas as pd
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 from rich import print
-from rich.progress import (
-    Progress,
-    BarColumn,
-    TimeRemainingColumn,
-    TimeElapsedColumn,
-    TextColumn,
-)
 
 # My Library
-from ..utils.config import load_config
-from ..core.tushare_proxy import TuShareProxy
-from ..utils.tools import tscode2name, symbol2tscode
-
-config = load_config()
-proxy = TuShareProxy(config)
+from ..utils.progress import default_progress
+from ..core.tushare_proxy import get_proxy
+from ..utils.tools import tscode2name, symbols2tscodes, to_tsdate
 
 output_dir = Path(__file__).parents[2] / "dataset"
-if not output_dir.exists():
-    output_dir.mkdir(parents=True, exist_ok=True)
+output_dir.mkdir(parents=True, exist_ok=True)
 
 progress = None
+writer: ThreadPoolExecutor = None
 
 
 def make_example(
@@ -47,6 +37,7 @@ def make_example(
     periods: list[int] = None,
     target_days: list[int] = None,
 ) -> None:
+    proxy = get_proxy()
     if periods is None:
         periods = [5, 10, 15, 30, 60, 90, 180, 360]
     if target_days is None:
@@ -54,77 +45,78 @@ def make_example(
 
     data = proxy.daily(
         ts_code=ts_code,
-        start_date=start_time.strftime("%Y%m%d"),
-        end_date=end_time.strftime("%Y%m%d"),
+        start_date=to_tsdate(start_time),
+        end_date=to_tsdate(end_time),
     ).reset_index(drop=True)
 
-    index = data.index.copy()
-    ts_code_pos = data.columns.get_loc("ts_code")
+    # 股票名称对所有样本都相同, 只需插入一次
+    name = tscode2name(ts_code)
+    data.insert(data.columns.get_loc("ts_code") + 1, "name", name)
+    trade_dates = data["trade_date"].to_numpy()
+    row_index = np.arange(len(data))
+
+    # 写文件交给单独的写线程完成, 与样本切分并行
+    pending: list[Future] = []
 
     for target_day in target_days:
-        end = 0
-        start = end + max(periods) + target_day
-        task = progress.add_task(
-            f"Making Clips of {target_day=}", total=index.max() - start
-        )
-        while start <= index.max():
-            mask = (end <= index) & (index <= start)
-            clip: pd.DataFrame = data[mask]
-
-            data_clip: pd.DataFrame = clip[target_day:].copy().reset_index(drop=True)
-
-            # 计算目标天数后的涨跌幅
-            data_close = data_clip.iloc[0]["close"]
-            target_row = clip.iloc[0]
-            target_close, target_date = target_row["close"], target_row["trade_date"]
-            percent_change = ((target_close - data_close) / data_close) * 100
-
-            data_clip = data_clip.assign(final_change=percent_change)
-
-            data_clip["name"] = pd.Series(
-                [name := tscode2name(ts_code)] * len(data_clip)
+        # 数据按日期升序排列, 以第t行为目标日的样本由第t-target_day行结束的period行组成
+        num_windows = len(data) - max(periods) - target_day
+        if num_windows <= 0:
+            continue
+
+        # 所有period都使用最近的num_windows个交易日作为目标日, 同一window_id在不同period中对应同一目标日
+        target_rows = np.arange(len(data) - num_windows, len(data))
+        end_rows = target_rows - target_day
+        target_dates = trade_dates[target_rows]
+
+        # 样本最后一天到目标日的涨跌幅
+        percent_change = (
+            (data["close"].shift(-target_day) - data["close"]) / data["close"] * 100
+        ).to_numpy()[end_rows]
+
+        task = progress.add_task(f"Making Clips of {target_day=}", total=len(periods))
+        for period in periods:
+            # 第j个窗口包含第j~j+period-1行, 目标日为第j+period-1+target_day行
+            windows = sliding_window_view(row_index, period)[end_rows - period + 1]
+
+            # 所有样本写入同一个文件, 通过window_id区分
+            period_clip = data.take(windows.ravel()).reset_index(drop=True)
+            period_clip["final_change"] = np.repeat(percent_change, period)
+            period_clip.insert(0, "target_date", np.repeat(target_dates, period))
+            period_clip.insert(
+                0, "window_id", np.repeat(np.arange(num_windows), period)
             )
-            data_clip.insert(ts_code_pos + 1, "name", data_clip.pop("name"))
-
-            for period in periods:
-                period_clip = data_clip.iloc[:period].copy()
-                filepath = (
-                    output_dir
-                    / f"{target_day=}/{target_date}/{ts_code}_{name}/{period=}.csv"
-                )
-                filepath.parent.mkdir(parents=True, exist_ok=True)
-                period_clip.to_csv(filepath, header=0, index=False)
-
-            end += 1
-            start += 1
+
+            filepath = output_dir / f"{target_day=}/{ts_code}_{name}/{period=}.feather"
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+            pending.append(
+                writer.submit(period_clip.to_feather, filepath, compression="zstd")
+            )
+
             progress.update(task, advance=1)
         progress.remove_task(task)
 
+    for future in pending:
+        future.result()
+
 
 def read_active_shares(txt_path: Path) -> list[str]:
     with open(txt_path, "r", encoding="utf-8") as file:
         lines = file.readlines()
 
-    return [symbol2tscode(line.strip()) for line in lines]
+    return symbols2tscodes(line.strip() for line in lines)
 
 
 def main():
-    global progress
+    global progress, writer
 
     active_shares = read_active_shares(
         Path(__file__).parents[2] / "analysis/core_shares.txt"
     )
 
     with (
-        progress := Progress(
-            TextColumn("[progress.description]{task.description}"),
-            BarColumn(),
-            TimeRemainingColumn(),
-            TextColumn("[progress.percentage][{task.completed}/{task.total}]"),
-            TimeElapsedColumn(),
-            expand=True,
-            transient=True,
-        )
+        ThreadPoolExecutor(max_workers=1) as writer,
+        default_progress() as progress,
     ):
 
         shares_task = progress.add_task("Making dataset", total=len(active_shares))
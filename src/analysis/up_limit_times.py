@@ -13,113 +13,171 @@ from pathlib import Path
 from datetime import datetime
 
 # Third-Party Library
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 from rich import print
-from rich.progress import (
-    Progress,
-    BarColumn,
-    TimeRemainingColumn,
-    TimeElapsedColumn,
-    TextColumn,
-)
+from rich.progress import Progress
 
 # My Library
-from ..utils.config import load_config
-from ..core.tushare_proxy import TuShareProxy
-from ..utils.tools import tscode2name, concat_df, get_relative_trade_day
-
-config = load_config()
-proxy = TuShareProxy(config)
-
+from ..utils.progress import default_progress
+from ..core.tushare_proxy import get_proxy
+from ..utils.tools import get_relative_trade_day, to_tsdate
+
+
+def _max_continuous(mask: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    _max_continuous 计算布尔数组每一段中连续True的最大长度
+
+    Args:
+        mask (np.ndarray): 布尔数组
+        starts (np.ndarray): 每一段的起始下标, 升序且第一个为0
+
+    Returns:
+        np.ndarray: 每一段中连续True的最大长度
+    """
+    position = np.arange(len(mask))
+    # 每行最近一次重置的位置: 未涨停的行, 以及每段第一行的前一行
+    reset = np.where(mask, -1, position)
+    reset[starts] = np.maximum(reset[starts], starts - 1)
+    run_length = position - np.maximum.accumulate(reset)
+    return np.maximum.reduceat(run_length, starts)
+
+
+def market_up_limit_times(
+    start_time: datetime, end_time: datetime, progress: Progress = None
+) -> pd.DataFrame:
+    """
+    market_up_limit_times 按交易日批量获取全市场数据, 计算所有股票在指定时间范围内的涨停和连板次数
+
+    Args:
+        start_time (datetime): 开始时间
+        end_time (datetime): 结束时间
+        progress (Progress, optional): 用于显示下载进度的进度条
+
+    Returns:
+        pd.DataFrame: 以ts_code为索引, 包含up_limit_times和max_continue_up_times两列
+    """
+    proxy = get_proxy()
+    trade_dates = proxy.trade_cal(
+        start_date=to_tsdate(start_time),
+        end_date=to_tsdate(end_time),
+        is_open="1",
+    )["cal_date"].tolist()
+
+    if progress is not None:
+        task = progress.add_task("下载全市场行情", total=len(trade_dates))
+
+    # 每批交易日的日线行情和涨跌停价格一起并发请求
+    batch_size = 16
+    daily_data, limit_data = [], []
+    for i in range(0, len(trade_dates), batch_size):
+        batch = trade_dates[i : i + batch_size]
+        results = proxy.gather(
+            [
+                (
+                    "daily",
+                    {"trade_date": d, "columns": ["ts_code", "trade_date", "close"]},
+                )
+                for d in batch
+            ]
+            + [
+                (
+                    "stk_limit",
+                    {"trade_date": d, "columns": ["ts_code", "trade_date", "up_limit"]},
+                )
+                for d in batch
+            ]
+        )
+        daily_data.extend(results[: len(batch)])
+        limit_data.extend(results[len(batch) :])
+        if progress is not None:
+            progress.update(
+                task,
+                advance=len(batch),
+                description=f"下载 [cyan]{batch[-1]}[/cyan] 的全市场行情",
+            )
 
-def up_limit_times(ts_code: str, start_time: datetime, end_time: datetime) -> int:
-    """up_limit_times 计算指定股票在指定时间范围内的涨停和连板次数"""
+    daily_data = pd.concat(daily_data, ignore_index=True)
+    limit_data = pd.concat(limit_data, ignore_index=True)
+
+    # 全市场数据中ts_code是重复上百万次的低基数字符串, 两张表使用相同类别的category后, 合并、排序和分组只需比较整数编码
+    ts_code_dtype = pd.CategoricalDtype(np.sort(daily_data["ts_code"].unique()))
+    data = (
+        daily_data.astype({"ts_code": ts_code_dtype})
+        .merge(
+            limit_data.astype({"ts_code": ts_code_dtype}),
+            on=["ts_code", "trade_date"],
+            how="left",
+        )
+        .sort_values(["ts_code", "trade_date"], ignore_index=True)
+    )
+    del daily_data, limit_data
 
-    daily_data = proxy.daily(
-        ts_code=ts_code,
-        start_date=start_time.strftime("%Y%m%d"),
-        end_date=end_time.strftime("%Y%m%d"),
-    ).set_index("trade_date")
+    up_limit_mask = data["close"].eq(data["up_limit"]).to_numpy()
 
-    limit_data = proxy.stk_limit(
-        ts_code=ts_code, start_date=start_time.strftime("%Y%m%d")
-    ).set_index("trade_date")
+    # 数据已按(ts_code, trade_date)排序, ts_code编码变化的位置即为每只股票的第一行
+    codes = data["ts_code"].cat.codes.to_numpy()
+    starts = np.flatnonzero(np.diff(codes, prepend=-1))
 
-    data = concat_df(
-        daily_data, limit_data.reindex(daily_data.index), remove_duplicates=True
+    result = pd.DataFrame(
+        {
+            "up_limit_times": np.add.reduceat(up_limit_mask.astype(np.int64), starts),
+            "max_continue_up_times": _max_continuous(up_limit_mask, starts),
+        },
+        index=pd.Index(data["ts_code"].cat.categories[codes[starts]], name="ts_code"),
     )
-
-    up_limit_mask = data["up_limit"] == data["close"]
-    groups = (~up_limit_mask).cumsum()
-    true_blocks = up_limit_mask.groupby(groups).sum()
-
-    return up_limit_mask.sum(), true_blocks.max()
+    # 返回普通的字符串索引, 便于与其他表按ts_code合并
+    result.index = result.index.astype(object)
+    return result
 
 
 def main():
 
-    listed_shares = proxy.listed_shares()
+    proxy = get_proxy()
+    listed_shares = proxy.listed_shares(fields="ts_code,name,exchange")
+
+    # 一次性计算筛选条件, 只保留沪深主板的非ST股票
+    main_market_mask = listed_shares["exchange"].isin(["SZSE", "SSE"])
+    st_mask = listed_shares["name"].str.contains("ST")
+    main_market_shares = listed_shares[main_market_mask & ~st_mask]
 
-    main_market_mask = (listed_shares["exchange"] == "SZSE") | (
-        listed_shares["exchange"] == "SSE"
+    end_time = datetime.now()
+    start_time = get_relative_trade_day(
+        end_date=end_time, relative_days=365, return_str=False
     )
-    main_market_shares = listed_shares[main_market_mask]
-
-    st_mask = main_market_shares["name"].str.contains("ST")
-    main_market_shares = main_market_shares[~st_mask].reindex()
-
-    with Progress(
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        TextColumn(
-            "[progress.percentage]{task.percentage:>3.0f}% [{task.completed:>4d}/{task.total}]"
-        ),
-        TimeRemainingColumn(),
-        TimeElapsedColumn(),
-        expand=True,
-        transient=True,
-    ) as progress:
-        task = progress.add_task("计算涨停次数", total=len(main_market_shares))
-
-        result = []
-        for ts_code in main_market_shares["ts_code"]:
-
-            name = tscode2name(ts_code)
-            progress.update(
-                task,
-                advance=1,
-                description=f"计算 [cyan]{ts_code}: {name}[/cyan] 的涨停次数",
-            )
-            up_times, max_continue_up_times = up_limit_times(
-                ts_code=ts_code,
-                start_time=get_relative_trade_day(
-                    end_date=datetime.now(),
-                    relative_days=365,
-                    return_str=False,
-                ),
-                end_time=datetime.now(),
-            )
 
-            result.append(
-                {
-                    "ts_code": ts_code,
-                    "name": name,
-                    "up_limit_times": up_times,
-                    "max_continue_up_times": max_continue_up_times,
-                }
-            )
+    with default_progress() as progress:
+        times = market_up_limit_times(
+            start_time=start_time, end_time=end_time, progress=progress
+        )
 
-            print(
-                f"{ts_code}         [bold]{name}[/bold], 涨停次数: [green]{up_times}[/green], 最大连板次数: [green]{max_continue_up_times}[/green]"
-            )
+    result = (
+        main_market_shares[["ts_code", "name"]]
+        .join(times, on="ts_code", how="inner")
+        .sort_values(by="up_limit_times", ascending=False)
+    )
 
-    result = pd.DataFrame(result).sort_values(by="up_limit_times", ascending=False)
+    for row in result.itertuples():
+        print(
+            f"{row.ts_code}         [bold]{row.name}[/bold], 涨停次数: [green]{row.up_limit_times}[/green], 最大连板次数: [green]{row.max_continue_up_times}[/green]"
+        )
 
     output_dir = Path(__file__).parents[2] / "analysis"
     output_dir.mkdir(parents=True, exist_ok=True)
-    result.to_csv(
-        Path(__file__).parents[2] / "analysis/up_limit_times.csv", index=False
-    )
+    # pyarrow的csv写入器为C++实现, 比pandas逐单元格格式化快得多
+    # pyarrow默认给字符串加引号, 表头和数据都按to_csv(index=False)的格式不加引号写出
+    # 股票代码和名称中不含逗号、引号与换行, 不加引号是安全的
+    with (output_dir / "up_limit_times.csv").open(mode="wb") as file:
+        file.write((",".join(result.columns) + "\n").encode("utf-8"))
+        pa_csv.write_csv(
+            pa.Table.from_pandas(result, preserve_index=False),
+            file,
+            write_options=pa_csv.WriteOptions(
+                include_header=False, quoting_style="none"
+            ),
+        )
 
 
 if __name__ == "__main__":
@@ -9,86 +9,87 @@ update.py 更新A股数据至今日最新
 """
 
 # Standard Library
-from pathlib import Path
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Third-Party Library
-import pandas as pd
 from rich import print
-from rich.progress import (
-    Progress,
-    BarColumn,
-    TimeRemainingColumn,
-    TimeElapsedColumn,
-    TextColumn,
-)
 
 # My Library
-from ..utils.config import load_config
-from ..core.tushare_proxy import TuShareProxy
-from ..utils.tools import tscode2name, concat_df, get_relative_trade_day
-
-config = load_config()
-proxy = TuShareProxy(config)
+from ..utils.progress import default_progress
+from ..core.tushare_proxy import get_proxy
+from ..utils.tools import tscode2name, get_relative_trade_day, to_tsdate
 
 
 def update(ts_code: str, start_time: datetime, end_time: datetime) -> None:
     """update 获取股票在指定日期内的数据"""
+    proxy = get_proxy()
 
     daily_data = proxy.daily(
         ts_code=ts_code,
-        start_date=start_time.strftime("%Y%m%d"),
-        end_date=end_time.strftime("%Y%m%d"),
+        start_date=to_tsdate(start_time),
+        end_date=to_tsdate(end_time),
     )
 
-    limit_data = proxy.stk_limit(
-        ts_code=ts_code, start_date=start_time.strftime("%Y%m%d")
-    )
+    limit_data = proxy.stk_limit(ts_code=ts_code, start_date=to_tsdate(start_time))
+
 
+def main(max_workers: int = 8):
+    """
+    main 并发更新主板非ST股票的日线数据
 
-def main():
+    Args:
+        max_workers (int, optional): 并发下载的线程数, 调用频率由各接口的max_calls_per_minute限制. 默认为8.
+    """
+    proxy = get_proxy()
 
-    listed_shares = proxy.listed_shares()
+    listed_shares = proxy.listed_shares(fields="ts_code,name,exchange")
 
-    main_market_mask = (listed_shares["exchange"] == "SZSE") | (
-        listed_shares["exchange"] == "SSE"
+    # 一次性计算筛选条件, 只保留沪深主板的非ST股票
+    main_market_mask = listed_shares["exchange"].isin(["SZSE", "SSE"])
+    st_mask = listed_shares["name"].str.contains("ST")
+    main_market_shares = listed_shares[main_market_mask & ~st_mask]
+
+    # 所有股票使用相同的时间范围, 保证同一天内多次运行的缓存参数一致
+    end_time = datetime.now()
+    start_time = get_relative_trade_day(
+        end_date=end_time, relative_days=365, return_str=False
     )
-    main_market_shares = listed_shares[main_market_mask]
-
-    st_mask = main_market_shares["name"].str.contains("ST")
-    main_market_shares = main_market_shares[~st_mask].reindex()
-
-    with Progress(
-        TextColumn("[progress.description]{task.description}"),
-        BarColumn(),
-        TextColumn("[progress.percentage]{task.percentage:>3.0f}%"),
-        TimeRemainingColumn(),
-        TimeElapsedColumn(),
-        expand=True,
-        transient=True,
-    ) as progress:
-        task = progress.add_task("更新A股日线数据", total=len(main_market_shares))
 
-        for ts_code in main_market_shares["ts_code"]:
+    with (
+        default_progress() as progress,
+        ThreadPoolExecutor(max_workers=max_workers) as executor,
+    ):
+        task = progress.add_task("更新A股日线数据", total=len(main_market_shares))
 
+        futures = {
+            executor.submit(
+                update, ts_code=ts_code, start_time=start_time, end_time=end_time
+            ): ts_code
+            for ts_code in main_market_shares["ts_code"]
+        }
+
+        # 单只股票下载失败时记录错误并继续, 不让一次失败阻塞在等待其余数千个任务上
+        failed: list[str] = []
+        for future in as_completed(futures):
+            ts_code = futures[future]
             name = tscode2name(ts_code)
             progress.update(
                 task,
                 advance=1,
-                description=f"正在下载 [cyan]{ts_code}: {name}[/cyan] 日线数据",
-            )
-            update(
-                ts_code=ts_code,
-                start_time=get_relative_trade_day(
-                    end_date=datetime.now(),
-                    relative_days=365,
-                    return_str=False,
-                ),
-                end_time=datetime.now(),
+                description=f"已下载 [cyan]{ts_code}: {name}[/cyan] 日线数据",
             )
 
+            if (error := future.exception()) is not None:
+                failed.append(ts_code)
+                print(f"{ts_code}  [bold]{name}[/bold] [red]更新失败: {error}[/red]")
+                continue
+
             print(f"{ts_code}  [bold]{name}[/bold] [green]更新完成[/green]")
 
+    if failed:
+        print(f"[red]{len(failed)}只股票更新失败: {', '.join(failed)}[/red]")
+
 
 if __name__ == "__main__":
     main()
@@ -9,13 +9,21 @@ cache_engin.py 为TuShare API提供了缓存加载与读取功能
 """
 
 # Standard Library
+import os
 import json
+import time
+import atexit
+import threading
 import hashlib
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import Dict, Any
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Optional
 
 # Third-Party Library
+import xxhash
 import pandas as pd
 
 # Torch Library
@@ -24,80 +32,304 @@ import pandas as pd
 from ..utils.config import APIProfile
 
 
+@lru_cache(maxsize=4096)
+def _hash_key(api_name: str, key: tuple[tuple[str, Any], ...]) -> str:
+    return xxhash.xxh3_64_hexdigest(f"{api_name}_{key!r}".encode())
+
+
+def _param_key(params: dict[str, Any]) -> tuple[tuple[str, Any], ...]:
+    """参数的规范形式, 与参数顺序无关, tushare会忽略值为None的参数, 因此这些参数也不参与缓存键的计算"""
+    return tuple(sorted((k, v) for k, v in params.items() if v is not None))
+
+
 def _hash_param(api_name: str, params: dict[str, Any]) -> str:
+    return _hash_key(api_name, _param_key(params))
+
+
+def _legacy_hash_param(api_name: str, params: dict[str, Any]) -> str:
+    """旧版本csv缓存文件使用的文件名哈希"""
     params_str = json.dumps(params, sort_keys=True)
     return hashlib.md5(f"{api_name}_{params_str}".encode()).hexdigest()
 
 
+def _log_write_error(future: Future) -> None:
+    """后台写入任务的回调, 写入线程中未被处理的异常不会传递给调用方, 在这里打印出来"""
+    if (error := future.exception()) is not None:
+        print(f"后台写入缓存失败: {type(error).__name__}: {error}")
+
+
 class TushareCacheEngine:
     def __init__(
         self,
         api_profile: APIProfile,
         cache_root: str | Path = Path(__file__).parents[2] / "cache",
+        dtypes: Optional[dict[str, str]] = None,
+        mem_size: int = 1024,
+        mem_bytes: int = 256 * 1024**2,
     ):
         self.api_profile = api_profile
+        self.dtypes = dtypes if dtypes is not None else {}
         self.cache_root = Path(cache_root)
-        if not self.cache_root.exists():
-            self.cache_root.mkdir(parents=True, exist_ok=True)
+        self.cache_root.mkdir(parents=True, exist_ok=True)
         self.cache_root = self.cache_root.resolve()
 
         self.hit: int = 0
         self.missed: int = 0
         self.expired: int = 0
 
+        # 各API缓存目录中缓存文件的修改时间, {api_name: {文件名: mtime}}
+        self._mtimes: dict[str, dict[str, float]] = {}
+        # 各API缓存目录中尚未迁移的旧版本csv缓存文件, {api_name: {文件名}}
+        self._legacy: dict[str, set[str]] = {}
+        # 内存缓存, {(api_name, 排序后的参数): (mtime, 数据)}, 条数超过mem_size或占用内存超过mem_bytes时淘汰最久未使用的数据
+        self.mem_size = mem_size
+        self.mem_bytes = mem_bytes
+        self._mem: OrderedDict[tuple, tuple[float, pd.DataFrame]] = OrderedDict()
+        # 内存缓存中每份数据占用的字节数及其总和
+        self._mem_nbytes: dict[tuple, int] = {}
+        self._mem_total: int = 0
+        self._mem_lock = threading.Lock()
+
+        # 写入磁盘缓存的后台线程, 只使用一个线程保证同一缓存文件的多次写入按提交顺序完成
+        self._writer = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="cache-writer"
+        )
+
+        atexit.register(self._dump_statics)
+        # 退出前等待所有缓存写入完成
+        atexit.register(self._writer.shutdown, wait=True)
+
     def statics(self) -> dict[str, int]:
         """返回缓存命中率"""
         total = self.hit + self.missed + self.expired
-        if total == 0:
-            return {"hit": 0, "missed": 0, "expired": 0}
+        # 还没有查询时各比率记为0, 返回的键保持一致
+        denominator = total or 1
         return {
             "total": total,
             "hit": self.hit,
             "missed": self.missed,
             "expired": self.expired,
-            "hit_rate": round(self.hit / total * 100, 2),
-            "miss_rate": round(self.missed / total * 100, 2),
-            "expired_rate": round(self.expired / total * 100, 2),
+            "hit_rate": round(self.hit / denominator * 100, 2),
+            "miss_rate": round(self.missed / denominator * 100, 2),
+            "expired_rate": round(self.expired / denominator * 100, 2),
         }
 
+    def _dump_statics(self) -> None:
+        """将本次运行的缓存命中情况累加保存到缓存目录下的.stats.json中"""
+        if self.hit + self.missed + self.expired == 0:
+            return
+
+        stats_path = self.cache_root / ".stats.json"
+        try:
+            totals = json.loads(stats_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            totals = {}
+
+        for key in ("hit", "missed", "expired"):
+            totals[key] = totals.get(key, 0) + getattr(self, key)
+        totals["updated"] = datetime.now().isoformat(timespec="seconds")
+        stats_path.write_text(json.dumps(totals, indent=4), encoding="utf-8")
+
+    def _mem_get(self, key: tuple) -> tuple[float, pd.DataFrame] | None:
+        with self._mem_lock:
+            if (entry := self._mem.get(key)) is not None:
+                self._mem.move_to_end(key)
+            return entry
+
+    def _mem_pop(self, key: tuple) -> None:
+        """删除内存缓存中的数据, 调用方需持有_mem_lock"""
+        if self._mem.pop(key, None) is not None:
+            self._mem_total -= self._mem_nbytes.pop(key)
+
+    def _mem_put(self, key: tuple, entry: tuple[float, pd.DataFrame] | None) -> None:
+        """写入内存缓存, entry为None时删除对应的数据"""
+        # 全市场单日数据每份有数百KB, 只按条数限制时数百份数据会一直占用数百MB内存, 因此同时按字节数限制
+        nbytes = 0 if entry is None else int(entry[1].memory_usage(deep=True).sum())
+        with self._mem_lock:
+            self._mem_pop(key)
+            # 超过内存上限的数据只保存在磁盘缓存中
+            if entry is None or nbytes > self.mem_bytes:
+                return
+            self._mem[key] = entry
+            self._mem_nbytes[key] = nbytes
+            self._mem_total += nbytes
+            while len(self._mem) > self.mem_size or self._mem_total > self.mem_bytes:
+                self._mem_pop(next(iter(self._mem)))
+
     def _get_cache_path(self, api_name: str, params: dict[str, Any]) -> Path:
-        cache_dir: Path = self.cache_root / api_name
-        cache_dir.mkdir(parents=True, exist_ok=True)
-        return cache_dir / f"{_hash_param(api_name, params)}.csv"
+        return self.cache_root / api_name / f"{_hash_param(api_name, params)}.feather"
+
+    def _get_mtimes(self, api_name: str) -> dict[str, float]:
+        """获取指定API缓存目录中所有缓存文件的修改时间, 每个目录只扫描一次"""
+        if (mtimes := self._mtimes.get(api_name)) is None:
+            cache_dir: Path = self.cache_root / api_name
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            mtimes, legacy = {}, set()
+            with os.scandir(cache_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".feather"):
+                        mtimes[entry.name] = entry.stat().st_mtime
+                    elif entry.name.endswith(".csv"):
+                        legacy.add(entry.name)
+            self._mtimes[api_name], self._legacy[api_name] = mtimes, legacy
+        return mtimes
+
+    def _migrate_legacy_cache(
+        self, api_name: str, params: dict[str, Any], cache_path: Path
+    ) -> None:
+        """将旧版本的csv缓存文件转换为feather格式"""
+        # 扫描目录时已经记录了所有旧缓存文件, 没有旧缓存时无需任何文件系统调用
+        if not (legacy := self._legacy.get(api_name)):
+            return
+        legacy_name = f"{_legacy_hash_param(api_name, params)}.csv"
+        if legacy_name not in legacy:
+            return
+        legacy.discard(legacy_name)
+
+        # 旧缓存以字符串形式保存, 读取时直接解析为配置中的数据类型, 未配置的列保持字符串
+        # read_csv无法直接解析为datetime64, 这些列读取后再转换
+        datetime_dtypes = {
+            k: v for k, v in self.dtypes.items() if v.startswith("datetime")
+        }
+        read_dtypes = defaultdict(
+            lambda: "str",
+            {k: v for k, v in self.dtypes.items() if k not in datetime_dtypes},
+        )
+
+        legacy_path = cache_path.with_name(legacy_name)
+        try:
+            data = pd.read_csv(
+                legacy_path, encoding="utf-8", dtype=read_dtypes, engine="c"
+            )
+        except FileNotFoundError:
+            return
+        except pd.errors.EmptyDataError:
+            legacy_path.unlink(missing_ok=True)
+            return
+
+        data = data.astype(
+            {k: v for k, v in datetime_dtypes.items() if k in data.columns}
+        )
+        data.to_feather(cache_path, compression="zstd")
+        # 保留旧缓存的修改时间, 避免迁移后缓存过期时间被重置
+        st = legacy_path.stat()
+        os.utime(cache_path, (st.st_atime, st.st_mtime))
+        legacy_path.unlink()
+
+    def _is_expired(self, api_name: str, mtime: float) -> bool:
+        # 直接比较时间戳, 每次检查不必构造datetime和timedelta对象
+        expire_days = self.api_profile.get_config(api_name).expire_days
+        return time.time() - mtime > expire_days * 86400.0
 
     def save_to_cache(
         self, api_name: str, params: dict[str, Any], data: pd.DataFrame
-    ) -> pd.DataFrame:
+    ) -> None:
+        """
+        save_to_cache 保存数据到内存缓存和磁盘缓存
+
+        保存的数据应当已经按照配置完成类型转换, feather格式会保留数据类型, 因此读取缓存后无需再次转换
+
+        Args:
+            api_name (str): API名称
+            params (dict[str, Any]): API参数
+            data (pd.DataFrame): 需要缓存的数据
+        """
+        # 扫描缓存目录的同时保证目录存在, 之后写入线程才能在其中创建文件
+        self._get_mtimes(api_name)
         cache_path = self._get_cache_path(api_name, params)
-        data.to_csv(cache_path, index=False, encoding="utf-8")
+        # feather格式要求默认的RangeIndex, reset_index同时复制了数据, 调用方之后修改data不会影响缓存
+        data = data.reset_index(drop=True)
+        # 内存缓存立即生效, 磁盘缓存在后台线程中写入, 调用方无需等待磁盘IO
+        self._mem_put((api_name, _param_key(params)), (time.time(), data))
+        future = self._writer.submit(self._write_cache, api_name, cache_path, data)
+        future.add_done_callback(_log_write_error)
+
+    def _write_cache(self, api_name: str, cache_path: Path, data: pd.DataFrame) -> None:
+        """将数据写入磁盘缓存文件, 在后台写入线程中执行"""
+        # 先写入临时文件再原子替换, 避免并发查询读到写了一半的缓存文件
+        tmp_path = cache_path.with_name(f"{cache_path.name}.tmp")
+        try:
+            data.to_feather(tmp_path, compression="zstd")
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            # pyarrow的类型错误等同样只影响本次缓存写入, 记录后删除临时文件
+            print(f"写入缓存文件{cache_path}失败: {type(e).__name__}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        self._get_mtimes(api_name)[cache_path.name] = os.stat(cache_path).st_mtime
+
+    def _repair_cache(self, api_name: str, cache_path: Path, error: Exception) -> None:
+        """读取缓存文件失败时的处理: 删除损坏的缓存文件, 并记为未命中"""
+        # 缓存文件在扫描目录后被删除时无需修复
+        if not isinstance(error, FileNotFoundError):
+            try:
+                pd.read_feather(cache_path)
+            except (OSError, ValueError):
+                print(f"缓存文件{cache_path}损坏, 修复该文件")
+                cache_path.unlink(missing_ok=True)
+            else:
+                # 缓存文件完好, 读取失败是因为指定了不存在的列
+                raise KeyError(f"缓存文件{cache_path}中不存在指定的列") from error
+
+        self._get_mtimes(api_name).pop(cache_path.name, None)
+        self.missed += 1
+        return None
 
     def load_from_cache(
         self,
         api_name: str,
         params: dict[str, Any],
+        columns: Optional[list[str]] = None,
+        check_expire: bool = True,
     ) -> pd.DataFrame | None:
-        cache_path = self._get_cache_path(api_name, params)
-        if not cache_path.exists():
-            self.missed += 1
-            return None
+        """
+        load_from_cache 读取缓存数据
+
+        Args:
+            api_name (str): API名称
+            params (dict[str, Any]): API参数
+            columns (Optional[list[str]], optional): 只读取指定的列, 默认读取所有列
+            check_expire (bool, optional): 是否检查缓存过期, 只会向后追加的历史数据缓存不会过期. 默认为True.
 
-        last_modified_time = datetime.fromtimestamp(cache_path.stat().st_mtime)
+        Returns:
+            pd.DataFrame | None: 缓存数据, 缓存不存在或者过期时返回None
+        """
+        # 内存缓存命中时无需计算哈希和访问磁盘
+        # 未启用Copy-on-Write时浅拷贝与缓存共享数据, 调用方原地修改会破坏缓存, 因此返回深拷贝; 按列选择本身会复制数据
+        key = (api_name, _param_key(params))
+        if (entry := self._mem_get(key)) is not None:
+            mtime, data = entry
+            if not check_expire or not self._is_expired(api_name, mtime):
+                self.hit += 1
+                return data.copy() if columns is None else data[columns]
+            self._mem_put(key, None)
 
-        if datetime.now() - last_modified_time > timedelta(
-            days=self.api_profile.get_config(api_name).expire_days
-        ):
+        mtimes = self._get_mtimes(api_name)
+        cache_path = self._get_cache_path(api_name, params)
+        if (mtime := mtimes.get(cache_path.name)) is None:
+            self._migrate_legacy_cache(api_name, params, cache_path)
+            try:
+                mtime = mtimes[cache_path.name] = os.stat(cache_path).st_mtime
+            except FileNotFoundError:
+                self.missed += 1
+                return None
+
+        if check_expire and self._is_expired(api_name, mtime):
             self.expired += 1
             return None
 
-        self.hit += 1
-
         try:
-            return pd.read_csv(cache_path, encoding="utf-8", dtype=str)
-        except pd.errors.EmptyDataError:
-            print(f"缓存文件{cache_path}损坏, 修复该文件")
-            cache_path.unlink()
-            self.missed += 1
-            return None
+            with open(cache_path, "rb") as file:
+                data = pd.read_feather(file, columns=columns)
+        except (OSError, ValueError) as e:
+            return self._repair_cache(api_name, cache_path, e)
+
+        self.hit += 1
+        # 内存缓存只保存完整的数据
+        if columns is None:
+            self._mem_put(key, (mtime, data))
+            return data.copy()
+        return data
 
 
 if __name__ == "__main__":
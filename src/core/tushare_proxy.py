@@ -9,23 +9,60 @@ tushare_proxy.py 为TuShare的代理实现
 """
 
 # Standard Library
-from functools import wraps
+import time
+import threading
+from functools import wraps, lru_cache
+from collections import deque
 from collections.abc import Callable
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import Any, Literal, Optional
 
 # Third-Party Library
+import numpy as np
 import pandas as pd
 import tushare as ts
+from pandas.api.types import pandas_dtype
 
 # My Library
-from ..utils.config import Config
+from ..utils.config import Config, load_config
 from .cache_engine import TushareCacheEngine
 
+# limit_list_d接口单次请求最多返回的数据条数
+LIMIT_LIST_D_MAX_ROWS = 2500
 
-def incremental_update_wrapper(
-    api_name: str, cache_start: datetime, cache_end: datetime
-) -> Callable:
+
+def _to_day(date_str: str) -> np.datetime64:
+    """将YYYYMMDD格式的日期转换为datetime64[D]"""
+    return np.datetime64(f"{date_str[:4]}-{date_str[4:6]}-{date_str[6:]}", "D")
+
+
+def _shift_date(date_str: str, days: int) -> str:
+    """将YYYYMMDD格式的日期移动days天, 使用datetime64[D]计算, 无需strptime/strftime"""
+    return str(_to_day(date_str) + np.timedelta64(days, "D")).replace("-", "")
+
+
+def _max_trade_date(data: pd.DataFrame, default: str) -> str:
+    """返回数据中最大的trade_date(YYYYMMDD格式的字符串), 数据为空时返回default"""
+    return default if data.empty else str(data["trade_date"].max())
+
+
+def _slice_trade_date(
+    data: pd.DataFrame,
+    start_date: str,
+    end_date: str,
+    columns: Optional[list[str]] = None,
+) -> pd.DataFrame:
+    """从按trade_date升序排列的数据中取出[start_date, end_date]内的数据, 两次二分查找即可得到区间的端点"""
+    trade_date = data["trade_date"].to_numpy()
+    lo = trade_date.searchsorted(int(start_date), side="left")
+    hi = trade_date.searchsorted(int(end_date), side="right")
+    result = data.iloc[lo:hi].reset_index(drop=True)
+    result.attrs.clear()
+    return result if columns is None else result[columns]
+
+
+def incremental_update_wrapper(api_name: str) -> Callable:
     """智能增量更新装饰器工厂"""
 
     def decorator(method: Callable) -> Callable:
@@ -35,8 +72,10 @@ def incremental_update_wrapper(
             if not self.config.api_profile.get_config(api_name).incremental_update:
                 return method(self, *args, **kwargs)
 
+            # columns不是tushare接口的参数, 不参与增量查询的参数构造
+            columns = kwargs.pop("columns", None)
+
             # 解析参数
-            params = method.__annotations__
             ts_code = kwargs.get("ts_code")
             trade_date = kwargs.get("trade_date")
             start_date = kwargs.get("start_date")
@@ -44,7 +83,7 @@ def incremental_update_wrapper(
 
             # 情况1：单日全市场查询（不启用增量更新）
             if trade_date is not None and ts_code is None:
-                return method(self, *args, **kwargs)
+                return method(self, *args, columns=columns, **kwargs)
 
             # 情况2：时间段查询（启用增量更新）
             if start_date is not None and end_date is not None:
@@ -54,30 +93,126 @@ def incremental_update_wrapper(
                     start_date=start_date,
                     end_date=end_date,
                     original_params=kwargs,
-                    cache_end=cache_end,
-                    cache_start=cache_start,
+                    columns=columns,
                 )
 
             # 其他情况保持原逻辑
-            return method(self, *args, **kwargs)
+            return method(self, *args, columns=columns, **kwargs)
 
         return wrapper
 
     return decorator
 
 
+class _RateLimiter:
+    """线程安全的限流器, 将调用均匀分布在每分钟的调用次数限制内"""
+
+    def __init__(self, calls_per_minute: int):
+        self._interval = 60.0 / calls_per_minute
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def acquire(self) -> None:
+        """预约下一个可用的调用时间, 未到该时间时阻塞等待"""
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next_time - now
+            self._next_time = max(now, self._next_time) + self._interval
+        if wait > 0:
+            time.sleep(wait)
+
+
 class TuShareProxy:
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, max_workers: int = 4):
         self.config = config
-        self.api = ts.pro_api(config.tushare.token)
-        self.cache_engine = TushareCacheEngine(config.api_profile)
+        self._local = threading.local()
+        # 字段类型只与配置有关, 只序列化一次; str在pandas中以object保存
+        # 具体的CategoricalDtype与不带类别的CategoricalDtype()不相等, 与字符串"category"比较才能匹配任意类别
+        self._dtype_map: dict[str, str] = config.field_types.model_dump()
+        self._target_dtypes = {
+            k: (
+                "category"
+                if v == "category"
+                else pandas_dtype("object" if v == "str" else v)
+            )
+            for k, v in self._dtype_map.items()
+        }
+        self.cache_engine = TushareCacheEngine(
+            config.api_profile, dtypes=self._dtype_map
+        )
+        # 并发请求使用的线程池, 线程数需要结合tushare的每分钟调用次数限制设置
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="tushare"
+        )
+        # 增量查询补充缺失数据使用独立的线程池, 避免在gather的工作线程中提交任务导致线程池死锁
+        self._gap_executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="tushare-gap"
+        )
+        # 每个接口一个限流器, {api_name: 限流器}
+        self._limiters: dict[str, _RateLimiter] = {}
+        self._limiters_lock = threading.Lock()
+        # 最近一个数据已经入库的交易日, {(日期, 是否已过入库时间): 交易日}
+        self._last_available: dict[tuple[date, bool], str] = {}
+        # 最近的指定交易日, {(日期, weekday): (交易日, YYYYMMDD格式的交易日)}
+        self._last_trade_dates: dict[
+            tuple[date, Optional[int]], tuple[datetime, str]
+        ] = {}
+
+    @property
+    def api(self):
+        """每个线程持有独立的tushare接口对象, 保证多线程并发请求时的线程安全"""
+        if (api := getattr(self._local, "api", None)) is None:
+            api = self._local.api = ts.pro_api(self.config.tushare.token)
+        return api
+
+    def _api_method(self, api_name: str) -> Callable:
+        """获取tushare接口方法, pro_api每次访问属性都会创建新的函数对象, 因此在每个线程中缓存"""
+        if (methods := getattr(self._local, "methods", None)) is None:
+            methods = self._local.methods = {}
+        if (method := methods.get(api_name)) is None:
+            method = methods[api_name] = getattr(self.api, api_name)
+        return method
+
+    def _limiter(self, api_name: str) -> _RateLimiter:
+        """获取指定接口的限流器, 第一次使用时按配置创建"""
+        if (limiter := self._limiters.get(api_name)) is None:
+            with self._limiters_lock:
+                if (limiter := self._limiters.get(api_name)) is None:
+                    api_config = self.config.api_profile.get_config(api_name)
+                    limiter = _RateLimiter(api_config.max_calls_per_minute)
+                    self._limiters[api_name] = limiter
+        return limiter
+
+    def gather(self, requests: list[tuple[str, dict[str, Any]]]) -> list[pd.DataFrame]:
+        """
+        gather 并发执行多个查询, 将N次请求的网络延迟重叠在一起
+
+        Args:
+            requests (list[tuple[str, dict[str, Any]]]): 查询列表, 每个元素为(方法名, 参数), 例如("daily", {"trade_date": "20250423"})
+
+        Returns:
+            list[pd.DataFrame]: 与requests顺序一致的查询结果
+        """
+        futures = [
+            self._executor.submit(getattr(self, method), **kwargs)
+            for method, kwargs in requests
+        ]
+        return [future.result() for future in futures]
 
     def _convert_dtypes(self, df: pd.DataFrame) -> pd.DataFrame:
-        """按照config中记录的数据类型转换DataFrame中的数据类型"""
-        dtypes = self.config.field_types.model_dump()
-        return df.astype(
-            {k: v for k, v in dtypes.items() if k in df.columns}, errors="raise"
-        )
+        """按照config中记录的数据类型转换DataFrame中的数据类型, 类型已经正确的列不做转换"""
+        # 超出数据范围的查询常常返回空表, 空表无需转换类型
+        if df.empty:
+            return df
+
+        # 只遍历DataFrame的列, 而不是配置中的所有字段
+        dtypes = {
+            k: self._dtype_map[k]
+            for k, dtype in df.dtypes.items()
+            if k in self._dtype_map and dtype != self._target_dtypes[k]
+        }
+        # 所有列的类型都已正确时直接返回, 否则只转换需要转换的列, 其余列不复制
+        return df.astype(dtypes, copy=False, errors="raise") if dtypes else df
 
     def _smart_incremental_query(
         self,
@@ -85,90 +220,115 @@ class TuShareProxy:
         ts_code: str,
         start_date: str,
         end_date: str,
-        cache_start: datetime,
-        cache_end: datetime,
         original_params: dict,
+        columns: Optional[list[str]] = None,
     ) -> pd.DataFrame:
         """
-        智能增量查询核心逻辑
-        """
-        # 转换日期为datetime对象
-        req_start = datetime.strptime(start_date, "%Y%m%d")
-        req_end = datetime.strptime(end_date, "%Y%m%d")
+        智能增量查询核心逻辑, 缓存始终保存完整的列, columns只作用于返回结果
 
-        # 生成初始缓存查询参数
-        cache_params = {
-            "ts_code": ts_code,
-            "start_date": cache_start.strftime("%Y%m%d"),
-            "end_date": cache_end.strftime("%Y%m%d"),
-        }
+        每只股票只保存一份缓存, 缓存覆盖的日期区间记录在DataFrame.attrs["date_range"]中,
+        没有缓存时只请求用户需要的区间, 之后只在请求区间超出缓存区间时向前/向后补充缺失的数据
+        """
+        # 不请求尚未入库的日期, 否则缓存区间会覆盖到还没有数据的日期, 同一天内的重复请求也会反复向后补充数据
+        end_date = min(end_date, self._last_available_trade_date())
 
-        # 尝试从缓存获取
-        cached = self._query(api_name, params=cache_params, use_cache=True)
-        current_min_date = cache_start
-        current_max_date = cache_end
+        # 历史行情入库后不再变化, 增量缓存不按expire_days过期, 请求区间超出缓存区间时只补充缺失的部分
+        cache_params = {"ts_code": ts_code}
+        cached = self.cache_engine.load_from_cache(
+            api_name, cache_params, check_expire=False
+        )
 
-        # 检查是否需要扩展数据范围
-        need_early_update = req_start < current_min_date
-        need_late_update = req_end > current_max_date
+        update_cache = cached is None or "date_range" not in cached.attrs
+        if update_cache:
+            # 没有缓存时只请求用户需要的区间
+            cached = self._query(
+                api_name,
+                params=original_params
+                | {"start_date": start_date, "end_date": end_date},
+                use_cache=False,
+                save_cache=False,
+            )
+            # 缓存区间只延伸到实际返回的最后一个交易日, 延迟发布或返回不完整的日期之后会重新请求
+            cache_min_date = start_date
+            cache_max_date = _max_trade_date(cached, start_date)
+        else:
+            cache_min_date, cache_max_date = cached.attrs["date_range"]
+            # 缓存覆盖了请求区间时直接切片, 保存的缓存总是按trade_date升序排列
+            if cache_min_date <= start_date and end_date <= cache_max_date:
+                return _slice_trade_date(cached, start_date, end_date, columns)
+
+        early_data = late_data = None
+        late_params = early_params = None
+
+        # 近期缺失数据
+        if end_date > cache_max_date:
+            late_params = original_params | {
+                "start_date": _shift_date(cache_max_date, 1),
+                "end_date": end_date,
+            }
 
-        # 获取早期缺失数据
-        if need_early_update:
+        # 早期缺失数据
+        if start_date < cache_min_date:
             early_params = original_params | {
-                "start_date": req_start.strftime("%Y%m%d"),
-                "end_date": (current_min_date - timedelta(days=1)).strftime("%Y%m%d"),
+                "start_date": start_date,
+                "end_date": _shift_date(cache_min_date, -1),
             }
-            early_data = self._query(
-                api_name, params=early_params, use_cache=False, save_cache=False
+            cache_min_date = start_date
+            update_cache = True
+
+        # 两段缺失数据都需要请求时, 近期数据提交到线程池中与早期数据并发请求;
+        # 只缺一段时直接在当前线程请求, 避免所有调用线程都排队等待线程池中的少数线程
+        late_future: Optional[Future] = None
+        if late_params is not None and early_params is not None:
+            late_future = self._gap_executor.submit(
+                self._query,
+                api_name,
+                params=late_params,
+                use_cache=False,
+                save_cache=False,
             )
-            if not early_data.empty:
-                cached = pd.concat([early_data, cached]).drop_duplicates(
-                    subset=["ts_code", "trade_date"], keep="first"
-                )
-                current_min_date = req_start
-
-        # 获取近期缺失数据
-        if need_late_update:
-            late_params = original_params | {
-                "start_date": (current_max_date + timedelta(days=1)).strftime("%Y%m%d"),
-                "end_date": req_end.strftime("%Y%m%d"),
-            }
+        elif late_params is not None:
             late_data = self._query(
                 api_name, params=late_params, use_cache=False, save_cache=False
             )
-            if not late_data.empty:
-                cached = pd.concat([late_data, cached]).drop_duplicates(
-                    subset=["ts_code", "trade_date"], keep="first"
-                )
-                current_max_date = req_end
 
-        # 如果数据范围已扩展，更新缓存
-        if need_early_update or need_late_update:
-            # 删除旧缓存
-            old_cache_path = self.cache_engine._get_cache_path(api_name, cache_params)
-            if old_cache_path.exists():
-                old_cache_path.unlink()
+        if early_params is not None:
+            early_data = self._query(
+                api_name, params=early_params, use_cache=False, save_cache=False
+            )
 
-            # 创建新缓存参数
-            new_cache_params = {
-                "ts_code": ts_code,
-                "start_date": current_min_date.strftime("%Y%m%d"),
-                "end_date": current_max_date.strftime("%Y%m%d"),
-            }
+        if late_future is not None:
+            late_data = late_future.result()
 
-            # 保存到新缓存
-            self.cache_engine.save_to_cache(api_name, new_cache_params, cached)
+        # 历史缓存不会过期, 近期数据只把缓存区间推进到实际返回的最后一个交易日,
+        # tushare尚未发布或返回为空的日期不计入缓存区间, 下次查询时会重新请求
+        if late_data is not None and not late_data.empty:
+            cache_max_date = _max_trade_date(late_data, cache_max_date)
+            update_cache = True
 
-        # 从完整数据中筛选请求范围
-        cached["trade_date_dt"] = pd.to_datetime(cached["trade_date"], format="%Y%m%d")
-        return (
-            cached[
-                (cached["trade_date_dt"] >= req_start)
-                & (cached["trade_date_dt"] <= req_end)
-            ]
-            .drop(columns=["trade_date_dt"])
-            .reset_index(drop=True)
-        )
+        # 三段数据的日期区间互不重叠, 按时间顺序拼接一次即可, 无需去重
+        frames = [
+            df
+            for df in (early_data, cached, late_data)
+            if df is not None and not df.empty
+        ]
+        if not frames:
+            return cached if columns is None else cached.reindex(columns=columns)
+        cached = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        # 拼接后缺失数据和拼接前的缓存不再使用, 立即释放以降低内存峰值
+        del frames, early_data, late_data
+
+        # 各段数据已经按trade_date升序排列, 旧版本缓存可能仍是倒序, 保证缓存升序后才能二分查找请求范围
+        if not cached["trade_date"].is_monotonic_increasing:
+            cached = cached.sort_values("trade_date", kind="stable", ignore_index=True)
+            update_cache = True
+
+        if update_cache:
+            cached = self._save_incremental(
+                api_name, ts_code, cached, cache_min_date, cache_max_date
+            )
+
+        return _slice_trade_date(cached, start_date, end_date, columns)
 
     def _query(
         self,
@@ -176,20 +336,29 @@ class TuShareProxy:
         params: dict[str, Any],
         use_cache: bool = True,
         save_cache: bool = True,
+        columns: Optional[list[str]] = None,
     ) -> pd.DataFrame:
-        """统一查询入口"""
-        # 尝试从缓存获取
+        """统一查询入口, 指定columns时只返回(从缓存中只读取)这些列"""
+        # 尝试从缓存获取, 缓存中的数据在保存前已经完成类型转换
         if (
             use_cache
-            and (cached := self.cache_engine.load_from_cache(api_name, params))
+            and (
+                cached := self.cache_engine.load_from_cache(
+                    api_name, params, columns=columns
+                )
+            )
             is not None
         ):
-            return self._convert_dtypes(cached)
+            return cached
 
         # 调用真实API
         try:
-            api_func: Callable = getattr(self.api, api_name)
-            fresh_data: pd.DataFrame = self._convert_dtypes(api_func(**params))
+            api_func: Callable = self._api_method(api_name)
+            self._limiter(api_name).acquire()
+            # tushare会忽略值为None的参数, 不发送这些参数以减小请求体
+            fresh_data: pd.DataFrame = self._convert_dtypes(
+                api_func(**{k: v for k, v in params.items() if v is not None})
+            )
         except Exception as e:
             print(f"API调用失败: {api_name}, 错误信息: {e}")
             statics = self.cache_engine.statics()
@@ -199,27 +368,33 @@ class TuShareProxy:
                 f"\t\t缓存命中次数: {statics['hit']}\n"
                 f"\t\t缓存未命中次数: {statics['missed']}\n"
                 f"\t\t缓存过期次数: {statics['expired']}\n"
-                f"\t命中率: {statics['hit_rate']}%, 未命中率: {statics['miss_rate']}, 过期率: {statics['expire_rate']}\n"
+                f"\t命中率: {statics['hit_rate']}%, 未命中率: {statics['miss_rate']}, 过期率: {statics['expired_rate']}\n"
             )
             raise e
 
+        # tushare按日期倒序返回数据, 统一按trade_date升序保存和返回, 所有查询路径的行顺序一致
+        if (
+            "trade_date" in fresh_data.columns
+            and not fresh_data["trade_date"].is_monotonic_increasing
+        ):
+            fresh_data = fresh_data.sort_values(
+                "trade_date", kind="stable", ignore_index=True
+            )
+
         # 保存到缓存
         if not fresh_data.empty and save_cache:
             self.cache_engine.save_to_cache(api_name, params, fresh_data)
 
-        return fresh_data
+        return fresh_data if columns is None else fresh_data[columns]
 
-    @incremental_update_wrapper(
-        "daily",
-        cache_end=(ce := datetime(year=2025, month=4, day=23)),
-        cache_start=ce - timedelta(days=365 * 6),
-    )
+    @incremental_update_wrapper("daily")
     def daily(
         self,
         ts_code: str = None,
         trade_date: str = None,
         start_date: str = None,
         end_date: str = None,
+        columns: Optional[list[str]] = None,
     ) -> pd.DataFrame:  # sourcery skip: extract-method
         """
         daily 获取A股日线行情
@@ -233,12 +408,13 @@ class TuShareProxy:
             trade_date (str): 交易日期（YYYYMMDD）
             start_date (str): 开始日期(YYYYMMDD)
             end_date (str): 结束日期(YYYYMMDD)
+            columns (Optional[list[str]], optional): 只返回指定的列, 读取缓存时只读取这些列
 
         Returns:
-            pd.DataFrame: 日线行情数据表格
+            pd.DataFrame: 日线行情数据表格, 所有查询方式都按trade_date升序排列
                 名称	    类型        描述
-                ts_code	    str     股票代码
-                trade_date	str	    交易日期
+                ts_code	    str     股票代码, 方式二查询单只股票时为category
+                trade_date	int32	交易日期, YYYYMMDD格式的整数
                 open	    float	开盘价
                 high	    float	最高价
                 low	        float	最低价
@@ -259,7 +435,127 @@ class TuShareProxy:
                 "start_date": start_date,
                 "end_date": end_date,
             },
+            columns=columns,
+        )
+
+    def _save_incremental(
+        self,
+        api_name: str,
+        ts_code: str,
+        data: pd.DataFrame,
+        start_date: str,
+        end_date: str,
+    ) -> pd.DataFrame:
+        """保存单只股票的增量缓存, 返回实际保存的数据"""
+        # 单只股票的缓存中ts_code只有一个取值, 以category保存只需一份字符串和每行一个整数编码
+        if "ts_code" in data.columns and data["ts_code"].dtype != "category":
+            data = data.assign(ts_code=data["ts_code"].astype("category"))
+        data.attrs["date_range"] = (start_date, end_date)
+        self.cache_engine.save_to_cache(api_name, {"ts_code": ts_code}, data)
+        return data
+
+    def _merge_into_cache(
+        self,
+        api_name: str,
+        ts_code: str,
+        data: pd.DataFrame,
+        start_date: str,
+        end_date: str,
+    ) -> None:
+        """将[start_date, end_date]区间内的数据合并到指定股票的增量缓存中, 调用方需保证合并后的缓存区间连续"""
+        cache_params = {"ts_code": ts_code}
+        cached = self.cache_engine.load_from_cache(
+            api_name, cache_params, check_expire=False
         )
+        frames = [data]
+        if cached is not None and (date_range := cached.attrs.get("date_range")):
+            trade_date = cached["trade_date"]
+            frames.append(
+                cached[(trade_date < int(start_date)) | (trade_date > int(end_date))]
+            )
+            start_date, end_date = min(start_date, date_range[0]), max(
+                end_date, date_range[1]
+            )
+
+        merged = pd.concat(frames, ignore_index=True).sort_values(
+            "trade_date", kind="stable", ignore_index=True
+        )
+        self._save_incremental(api_name, ts_code, merged, start_date, end_date)
+
+    def daily_multi(
+        self,
+        ts_codes: list[str],
+        start_date: str,
+        end_date: str,
+        columns: Optional[list[str]] = None,
+        chunk_size: int = 50,
+    ) -> dict[str, pd.DataFrame]:
+        """
+        daily_multi 批量获取多只股票的日线行情, daily接口支持以逗号分隔的多个ts_code, 未被缓存覆盖的股票合并为一次请求
+
+        Args:
+            ts_codes (list[str]): 股票代码列表
+            start_date (str): 开始日期 （格式：YYYYMMDD 下同）
+            end_date (str): 结束日期
+            columns (Optional[list[str]], optional): 只返回指定的列, 默认返回所有列
+            chunk_size (int, optional): 每次请求最多包含的股票数量. 默认为50.
+
+        Returns:
+            dict[str, pd.DataFrame]: {ts_code: 日线行情}, 每只股票的数据与daily(ts_code, start_date, end_date)相同
+        """
+        end_date = min(end_date, self._last_available_trade_date())
+
+        # 只批量请求没有缓存, 或者缓存区间与请求区间相交/相邻的股票, 这样合并后的缓存区间仍然连续
+        # 未启用增量更新时批量请求的结果无法被daily复用, 直接逐个查询
+        missing = []
+        incremental = self.config.api_profile.get_config("daily").incremental_update
+        for ts_code in ts_codes if incremental else ():
+            cached = self.cache_engine.load_from_cache(
+                "daily", {"ts_code": ts_code}, check_expire=False
+            )
+            date_range = None if cached is None else cached.attrs.get("date_range")
+            if date_range is None or (
+                (date_range[0] > start_date or date_range[1] < end_date)
+                and date_range[0] <= _shift_date(end_date, 1)
+                and _shift_date(start_date, -1) <= date_range[1]
+            ):
+                missing.append(ts_code)
+
+        # tushare单次最多返回6000行, 按请求区间的自然日数量限制每次请求的股票数量
+        days = int((_to_day(end_date) - _to_day(start_date)).astype(int)) + 1
+        chunk_size = max(1, min(chunk_size, 6000 // max(days, 1)))
+        for i in range(0, len(missing), chunk_size):
+            chunk = missing[i : i + chunk_size]
+            fetched = self._query(
+                "daily",
+                params={
+                    "ts_code": ",".join(chunk),
+                    "start_date": start_date,
+                    "end_date": end_date,
+                },
+                use_cache=False,
+                save_cache=False,
+            )
+            # 整批都没有返回的日期视为tushare尚未发布, 不计入缓存区间, 之后会重新请求
+            if fetched.empty:
+                continue
+            fetched_end = _max_trade_date(fetched, end_date)
+            groups = dict(tuple(fetched.groupby("ts_code")))
+            for ts_code in chunk:
+                # 没有数据的股票(如停牌)同样记录缓存区间, 避免之后重复请求
+                data = groups.get(ts_code, fetched.iloc[:0])
+                self._merge_into_cache("daily", ts_code, data, start_date, fetched_end)
+
+        # 缓存已经覆盖所有已发布的请求区间, 以下查询只会为尚未发布的日期访问网络
+        return {
+            ts_code: self.daily(
+                ts_code=ts_code,
+                start_date=start_date,
+                end_date=end_date,
+                columns=columns,
+            )
+            for ts_code in ts_codes
+        }
 
     def trade_cal(
         self,
@@ -295,6 +591,23 @@ class TuShareProxy:
             },
         )
 
+    def _last_available_trade_date(self) -> str:
+        """最近一个日线数据已经入库的交易日, 每个自然日只查询一次交易日历"""
+        now = datetime.now()
+        # tushare在交易日15:00~16:00之间更新当天的日线数据
+        key = (now.date(), now.hour >= 16)
+        if (result := self._last_available.get(key)) is None:
+            today = now.strftime("%Y%m%d")
+            cal_date = self.trade_cal(
+                start_date=(now - timedelta(days=30)).strftime("%Y%m%d"),
+                end_date=today,
+                is_open="1",
+            )["cal_date"]
+            if not key[1]:
+                cal_date = cal_date[cal_date < today]
+            result = self._last_available[key] = cal_date.max()
+        return result
+
     def last_trade_date(
         self, weekday: int = None, return_str: bool = True
     ) -> str | datetime:
@@ -309,24 +622,31 @@ class TuShareProxy:
             str: 最近的一个指定交易日
         """
         today = datetime.now()
-        last_trade_date = self.trade_cal(
+        # 同一个自然日内结果不变, 日期变化后自动重新查询
+        key = (today.date(), weekday)
+        if (cached := self._last_trade_dates.get(key)) is not None:
+            return cached[1] if return_str else cached[0]
+
+        if weekday is not None:
+            assert 1 <= weekday <= 5, "weekday must be between 1 and 5"
+
+        cal_dates = self.trade_cal(
             start_date=(today - timedelta(days=30)).strftime("%Y%m%d"),
             end_date=today.strftime("%Y%m%d"),
             is_open="1",
-        )
+        )["cal_date"]
 
-        last_trade_date["cal_date"] = pd.to_datetime(
-            last_trade_date["cal_date"], format="%Y%m%d"
-        )
-
-        if weekday is not None:
-            assert 1 <= weekday <= 5, "weekday must be between 1 and 5"
-            last_trade_date = last_trade_date[
-                last_trade_date["cal_date"].dt.weekday == (weekday - 1)
-            ].reset_index(drop=True)
+        # 从最近的交易日向前查找, 通常几次循环就能找到, 无需转换整列日期
+        for cal_date in sorted(cal_dates, reverse=True):
+            result = datetime.strptime(cal_date, "%Y%m%d")
+            if weekday is None or result.weekday() == weekday - 1:
+                break
+        else:
+            raise ValueError(f"过去30天内没有星期{weekday}的交易日")
 
-        result: datetime = last_trade_date.loc[0]["cal_date"]
-        return result.strftime("%Y%m%d") if return_str else result
+        # cal_date已经是YYYYMMDD格式的字符串, 与datetime一起保存, 命中时无需再格式化
+        self._last_trade_dates[key] = (result, cal_date)
+        return cal_date if return_str else result
 
     def stock_basic(
         self,
@@ -337,6 +657,7 @@ class TuShareProxy:
         market: Optional[Literal["主板", "创业板", "科创板", "CDR", "北交所"]] = None,
         exchange: Optional[Literal["SSE", "SZSE", "BSE"]] = None,
         list_status: Optional[Literal["L", "D", "P"]] = None,
+        columns: Optional[list[str]] = None,
     ) -> pd.DataFrame:
         """
         stock_basic 获取股票基本信息
@@ -350,6 +671,7 @@ class TuShareProxy:
             market (Optional[Literal[&quot;&quot;, &quot;主板&quot;, &quot;创业板&quot;, &quot;科创板&quot;, &quot;CDR&quot;, &quot;北交所&quot;], optional): 获得指定板块中的股票的基础信息.
             exchange (Optional[ Literal[&quot;SSE&quot;, &quot;SZSE&quot;, &quot;BSE&quot;] ], optional): 获得指定交易所中的股票的基础信息. SSE上交所, SZSE深交所, BSE北交所.
             list_status (Optional[Literal[&quot;L&quot;, &quot;D&quot;, &quot;P&quot;]], optional): 获得指定状态的股票的基础信息. &quot;L&quot; 正常交易, &quot;D&quot; 退市, &quot;P&quot; 暂停上市.
+            columns (Optional[list[str]], optional): 只返回(从缓存中只读取)指定的列, 与fields不同, 不影响请求和缓存的内容. 默认返回所有列.
 
         Returns:
             pd.DataFrame: 股票基本信息数据表格
@@ -383,12 +705,16 @@ class TuShareProxy:
                 "exchange": exchange,
                 "list_status": list_status,
             },
+            columns=columns,
         )
 
-    def listed_shares(self) -> pd.DataFrame:
+    def listed_shares(self, fields: Optional[str] = None) -> pd.DataFrame:
         """
         listed_shares 获取上市公司列表
 
+        Args:
+            fields (Optional[str], optional): 只返回指定的字段, 多个字段用逗号分隔, 例如"ts_code,name". 所有字段只请求并缓存一次, 指定字段时从缓存中读取对应的列. 默认返回所有字段.
+
         Returns:
             pd.DataFrame: 上市公司列表
                 名称	        类型	默认显示	描述
@@ -399,20 +725,19 @@ class TuShareProxy:
                 exchange	    str	    N	    交易所代码
         """
         return self.stock_basic(
-            fields="ts_code,symbol,name,full_name,cnspell,exchange", list_status="L"
+            fields="ts_code,symbol,name,full_name,cnspell,exchange",
+            list_status="L",
+            columns=None if fields is None else fields.split(","),
         )
 
-    @incremental_update_wrapper(
-        "stk_limit",
-        cache_end=(ce := datetime(year=2025, month=4, day=23)),
-        cache_start=ce - timedelta(days=365 * 6),
-    )
+    @incremental_update_wrapper("stk_limit")
     def stk_limit(
         self,
         ts_code: str = None,
         trade_date: str = None,
         start_date: str = None,
         end_date: str = None,
+        columns: Optional[list[str]] = None,
     ) -> pd.DataFrame:
         """
         stk_limit 获取全市场（包含A/B股和基金）每日涨跌停价格，包括涨停价格，跌停价格等，每个交易日8点40左右更新当日股票涨跌停价格。
@@ -426,11 +751,12 @@ class TuShareProxy:
             trade_date (str): 交易日期（YYYYMMDD）
             start_date (str): 开始日期(YYYYMMDD)
             end_date (str): 结束日期(YYYYMMDD)
+            columns (Optional[list[str]], optional): 只返回指定的列, 读取缓存时只读取这些列
 
         Returns:
             pd.DataFrame: 每日涨跌停价格表格
                 名称	        类型	默认显示	描述
-                trade_date	    str	    Y	    交易日期
+                trade_date	    int32	Y	    交易日期, YYYYMMDD格式的整数
                 ts_code	        str	    Y	    TS股票代码
                 up_limit	    float	Y	    涨停价
                 down_limit	    float	Y	    跌停价
@@ -443,6 +769,7 @@ class TuShareProxy:
                 "start_date": start_date,
                 "end_date": end_date,
             },
+            columns=columns,
         )
 
     def limit_list_ths(
@@ -516,6 +843,7 @@ class TuShareProxy:
         exchange: Literal["SH", "SZ", "BJ"] = None,
         start_date: Optional[str] = None,
         end_date: Optional[str] = None,
+        window_days: int = 15,
     ) -> list[pd.DataFrame]:
         """
         limit_list_d 获取A股每日涨跌停、炸板数据情况，数据从2020年开始（不提供ST股票的统计）
@@ -532,9 +860,10 @@ class TuShareProxy:
             exchange (Literal[&quot;SH&quot;, &quot;SZ&quot;, &quot;BJ&quot;], optional): 交易所（SH上交所SZ深交所BJ北交所）
             start_date (Optional[str], optional): 开始日期
             end_date (Optional[str], optional): 结束日期
+            window_days (int, optional): 方式二中每次请求包含的自然日数量, 接口单次最多返回2500条数据, 因此按窗口分段请求, 结果被截断的窗口会自动对半拆分. 默认为15.
 
         Returns:
-            pd.DataFrame: A股每日涨跌停/炸板数据
+            list[pd.DataFrame]: 按交易日升序排列的每日的A股涨跌停/炸板数据
                 名称	         类型	默认显示	描述
                 trade_date	    str	    Y	    交易日期
                 ts_code	        str	    Y	    股票代码
@@ -557,35 +886,64 @@ class TuShareProxy:
 
         """
 
-        trade_dates = [trade_date] if trade_date else []
+        params = {"ts_code": ts_code, "limit_type": limit_type, "exchange": exchange}
 
-        start = datetime.strptime(start_date, "%Y%m%d")
-        end = datetime.strptime(end_date, "%Y%m%d")
-        while start <= end:
-            trade_dates.append(start.strftime("%Y%m%d"))
-            start += timedelta(days=1)
+        # 方式一: 单日查询
+        if start_date is None or end_date is None:
+            return [
+                self._query(
+                    api_name="limit_list_d", params=params | {"trade_date": trade_date}
+                )
+            ]
 
-        return [
-            self._query(
+        # 方式二: 每个窗口只请求一次, 再按交易日拆分, 非交易日不会产生请求
+        windows = []
+        window_start = start_date
+        while window_start <= end_date:
+            window_end = min(_shift_date(window_start, window_days - 1), end_date)
+            windows.append((window_start, window_end))
+            window_start = _shift_date(window_end, 1)
+
+        # 返回条数达到接口上限说明窗口内的结果被截断, 将窗口对半拆分后重新请求
+        # 被截断的结果仍会写入缓存, 再次查询时命中缓存后同样会被拆分, 不会产生额外的请求
+        data = []
+        pending = deque(windows)
+        while pending:
+            window_start, window_end = pending.popleft()
+            df = self._query(
                 api_name="limit_list_d",
-                params={
-                    "trade_date": trade_date,
-                    "ts_code": ts_code,
-                    "limit_type": limit_type,
-                    "exchange": exchange,
-                    "start_date": start_date,
-                    "end_date": end_date,
-                },
+                params=params | {"start_date": window_start, "end_date": window_end},
             )
-            for trade_date in trade_dates
+            if len(df) >= LIMIT_LIST_D_MAX_ROWS and window_start < window_end:
+                days = int((_to_day(window_end) - _to_day(window_start)).astype(int))
+                mid = _shift_date(window_start, days // 2)
+                pending.extendleft(
+                    [(_shift_date(mid, 1), window_end), (window_start, mid)]
+                )
+                continue
+            data.append(df)
+
+        # start_date晚于end_date时没有任何窗口, 与只有空结果时一样返回空列表
+        if not data:
+            return []
+        data = pd.concat([df for df in data if not df.empty] or data, ignore_index=True)
+        if data.empty:
+            return []
+        if trade_date is not None:
+            data = data[data["trade_date"] == int(trade_date)]
+        return [
+            group.reset_index(drop=True)
+            for _, group in data.groupby("trade_date", sort=True)
         ]
 
 
-if __name__ == "__main__":
-    from datetime import datetime, timedelta
-    from ..utils.config import load_config
+@lru_cache(maxsize=1)
+def get_proxy() -> TuShareProxy:
+    """get_proxy 获取全局共享的TuShareProxy实例, 在第一次调用时创建"""
+    return TuShareProxy(load_config())
+
 
-    config = load_config()
-    proxy = TuShareProxy(config)
+if __name__ == "__main__":
+    proxy = get_proxy()
 
     print(proxy.last_trade_date(weekday=3))
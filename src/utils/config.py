@@ -9,17 +9,32 @@ config.py 提供了配置文件的读取和解析功能
 """
 
 # Standard Library
+import os
+import json
+import hashlib
 from pathlib import Path
+from functools import lru_cache
 from typing import Optional, Literal
 
 # Third-Party Library
 import yaml
 import pandas as pd
 import tushare as ts
-from pydantic import BaseModel, ConfigDict, field_validator, Field
+from pydantic import BaseModel, ConfigDict, TypeAdapter, field_validator, Field
 
 DEFAULT_CONFIG_PATH = Path(__file__).parents[2] / "config.yaml"
 
+# 优先使用libyaml的C实现解析配置文件, 未安装libyaml时退回纯Python实现
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+@lru_cache(maxsize=None)
+def _probe_token(token: str) -> bool:
+    """调用一次tushare接口在线验证token, 同一token在进程内只验证一次"""
+    api = ts.pro_api(token)
+    df = api.daily(ts_code="000001.SZ", start_date="20180701", end_date="20180718")
+    return isinstance(df, pd.DataFrame) and df.shape == (13, 11)
+
 
 class TushareConfig(BaseModel):
     token: str
@@ -28,9 +43,8 @@ class TushareConfig(BaseModel):
     def validate_token(cls, value: str) -> str:
         if not value:
             raise ValueError("Token不能为空")
-        api = ts.pro_api(value)
-        df = api.daily(ts_code="000001.SZ", start_date="20180701", end_date="20180718")
-        if not (isinstance(df, pd.DataFrame) and df.shape == (13, 11)):
+        # 在线验证需要调用一次tushare接口, 只有设置了STOCK_VALIDATE_TOKEN=1时才进行
+        if os.environ.get("STOCK_VALIDATE_TOKEN") == "1" and not _probe_token(value):
             raise ValueError("Token无效")
         return value
 
@@ -38,6 +52,8 @@ class TushareConfig(BaseModel):
 class APIConfig(BaseModel):
     expire_days: int = Field(default=5)
     incremental_update: bool = Field(default=False)
+    # tushare按账户积分限制每个接口每分钟的调用次数, 并发请求时所有线程共享该限制
+    max_calls_per_minute: int = Field(default=200, gt=0)
 
     model_config = ConfigDict(extra="forbid")
 
@@ -63,7 +79,7 @@ class APIProfile(BaseModel):
 
 
 PandasDType = Literal[
-    "str", "float64", "int64", "datetime64", "bool", "category", "object"
+    "str", "float64", "int64", "int32", "datetime64", "bool", "category", "object"
 ]
 
 
@@ -71,7 +87,7 @@ class FieldTypesConfig(BaseModel):
     """字段类型映射配置（对应pandas的dtype）"""
 
     ts_code: PandasDType = Field("str", description="Tushare证券代码，格式：000001.SZ")
-    trade_date: PandasDType = Field("str", description="交易日期")
+    trade_date: PandasDType = Field("int32", description="交易日期, 以整数YYYYMMDD保存")
     open: PandasDType = Field("float64", description="开盘价")
     high: PandasDType = Field("float64", description="最高价")
     low: PandasDType = Field("float64", description="最低价")
@@ -82,7 +98,7 @@ class FieldTypesConfig(BaseModel):
     vol: PandasDType = Field("float64", description="成交量（单位：手）")
     amount: PandasDType = Field("float64", description="成交额（单位：千元）")
     exchange: PandasDType = Field(
-        "str",
+        "category",
         description="交易所代号 (SSE上交所, SZSE深交所, CFFEX中金所, SHFE上期所, CZCE郑商所, DCE大商所, INE上能源)",
     )
     cal_date: PandasDType = Field("str", description="日历日期")
@@ -95,15 +111,15 @@ class FieldTypesConfig(BaseModel):
     fullname: PandasDType = Field("str", description="股票全称")
     enname: PandasDType = Field("str", description="英文全称")
     cnspell: PandasDType = Field("str", description="拼音缩写")
-    market: PandasDType = Field("str", description="市场类型")
-    curr_type: PandasDType = Field("str", description="交易货币类型")
+    market: PandasDType = Field("category", description="市场类型")
+    curr_type: PandasDType = Field("category", description="交易货币类型")
     list_status: PandasDType = Field(
-        "str", description="上市状态 (L:上市, D:退市, P:暂停上市)"
+        "category", description="上市状态 (L:上市, D:退市, P:暂停上市)"
     )
     list_date: PandasDType = Field("str", description="上市日期")
     delist_date: PandasDType = Field("str", description="退市日期")
     is_hs: PandasDType = Field(
-        "str", description="沪深港通标志 (N:否, H:沪股通, S:深股通)"
+        "category", description="沪深港通标志 (N:否, H:沪股通, S:深股通)"
     )
     act_name: PandasDType = Field("str", description="实控人名称")
     act_ent_type: PandasDType = Field("str", description="实控人企业性质")
@@ -158,19 +174,66 @@ class FieldTypesConfig(BaseModel):
     model_config = ConfigDict(extra="forbid", frozen=True)
 
 
+# FieldTypesConfig不可变, 配置文件中未给出字段类型时所有Config共享同一个默认实例
+# 默认值都是合法的字段类型, 使用model_construct构造, 跳过字段校验
+_FIELD_TYPES_DEFAULT = FieldTypesConfig.model_construct()
+# 预先构建的校验器, 解析字典时不再经过FieldTypesConfig(**v)的参数展开
+_FIELD_TYPES_ADAPTER = TypeAdapter(FieldTypesConfig)
+
+
 class Config(BaseModel):
     tushare: TushareConfig
     api_profile: APIProfile
-    field_types: FieldTypesConfig
+    field_types: FieldTypesConfig = Field(default_factory=lambda: _FIELD_TYPES_DEFAULT)
 
     @field_validator("field_types", mode="before")
     def validate_field_types(cls, v):
-        return FieldTypesConfig(**v) if isinstance(v, dict) else v
+        if not v:
+            return _FIELD_TYPES_DEFAULT
+        return _FIELD_TYPES_ADAPTER.validate_python(v) if isinstance(v, dict) else v
+
+
+@lru_cache(maxsize=None)
+def _config_schema_hash() -> str:
+    """Config的json schema哈希, 用于判断配置缓存是否由当前版本的代码生成"""
+    schema = json.dumps(Config.model_json_schema(), sort_keys=True)
+    return hashlib.md5(schema.encode("utf-8")).hexdigest()
+
+
+@lru_cache(maxsize=16)
+def _load_config(config_path: Path, mtime_ns: int, size: int) -> Config:
+    """按照(路径, 修改时间, 大小)缓存解析结果, 配置文件被修改后会重新解析"""
+    # 校验后的配置以json保存在配置文件旁, 配置文件未被修改时直接读取json, 跳过yaml解析
+    # json中记录了Config的schema哈希, 代码中的配置结构改变后旧的json会被忽略
+    sidecar = config_path.with_suffix(".cache.json")
+    try:
+        if os.stat(sidecar).st_mtime_ns >= mtime_ns:
+            cached = json.loads(sidecar.read_bytes())
+            if cached.get("schema") == _config_schema_hash():
+                return Config.model_validate(cached["config"])
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+
+    with config_path.open(mode="r", encoding="utf-8") as file:
+        config_data = yaml.load(file, Loader=YamlLoader)
+    config = Config(**config_data)
+
+    try:
+        tmp_path = sidecar.with_suffix(".tmp")
+        cached = {
+            "schema": _config_schema_hash(),
+            "config": config.model_dump(mode="json"),
+        }
+        tmp_path.write_text(json.dumps(cached, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, sidecar)
+    except OSError:
+        pass
+    return config
 
 
 def load_config(config_path: str | Path = DEFAULT_CONFIG_PATH) -> Config:
     """
-    load_config 从配置文件中加载配置
+    load_config 从配置文件中加载配置, 配置文件未被修改时只会解析一次
     Args:
         config_path (str | Path, optional): 配置文件路径. 默认为 DEFAULT_CONFIG_PATH.
     Returns:
@@ -178,9 +241,8 @@ def load_config(config_path: str | Path = DEFAULT_CONFIG_PATH) -> Config:
     """
     config_path = Path(config_path) if isinstance(config_path, str) else config_path
     assert config_path.suffix == ".yaml", "配置文件必须是yaml格式"
-    with config_path.open(mode="r", encoding="utf-8") as file:
-        config_data = yaml.safe_load(file)
-    return Config(**config_data)
+    st = config_path.stat()
+    return _load_config(config_path.resolve(), st.st_mtime_ns, st.st_size)
 
 
 if __name__ == "__main__":
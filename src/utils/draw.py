@@ -10,13 +10,14 @@ draw.py 提供了一些绘图函数，用于可视化数据
 
 # Standard Library
 import platform
+from functools import lru_cache
 from typing import Optional
 from datetime import timedelta, datetime
 
 # Third-Party Library
+import numpy as np
 import pandas as pd
 import seaborn as sns
-import matplotlib as mpl
 import matplotlib.pyplot as plt
 import matplotlib.font_manager as mpl_font
 
@@ -25,15 +26,13 @@ from plotly.graph_objects import Figure
 from plotly.subplots import make_subplots
 
 # My Library
-from ..utils.tools import tscode2name
-from ..utils.config import load_config
-from ..core.tushare_proxy import TuShareProxy
-
-proxy = TuShareProxy(load_config())
+from ..utils.tools import tscode2name, to_pydate, to_tsdate
+from ..core.tushare_proxy import get_proxy
 
 
+@lru_cache(maxsize=8)
 def setup_matplotlib(font: str = None) -> None:
-    """设置Matplotlib中文显示"""
+    """设置Matplotlib中文显示, 同一字体只设置一次, 在notebook中重复调用时不再重复设置"""
     sns.set_theme()
     params = {
         "font.family": None,
@@ -68,44 +67,61 @@ def plot_candle(
 ) -> Figure:
 
     assert ts_code is not None or daily is not None
-    if ts_code is not None:
-        e = datetime.now().strftime("%Y%m%d") if end_date is None else end_date
-        s = (
-            (datetime.now() - timedelta(days=365 * 2)).strftime("%Y%m%d")
-            if start_date is None
-            else start_date
-        )
-        daily = proxy.daily(ts_code=ts_code, start_date=s, end_date=e)
 
     if mavs is None:
         mavs = [5, 10, 20]
     assert len(mavs) <= 5
 
-    dates = pd.to_datetime(daily["trade_date"], format="%Y%m%d")
-
-    if fill_mav:
-        # NOTE: 如果长期停牌这里就有问题
-        end_date = dates.min()
-        start_date = end_date - timedelta(max(mavs) * 10)
+    # NOTE: 如果长期停牌这里就有问题
+    warmup = timedelta(max(mavs) * 10)
 
-        prev_daily = proxy.daily(
-            ts_code=daily["ts_code"].iloc[0],
-            start_date=start_date.strftime("%Y%m%d"),
-            end_date=end_date.strftime("%Y%m%d"),
-        ).iloc[1 : max(mavs)]
+    if ts_code is not None:
+        e = to_tsdate(datetime.now()) if end_date is None else end_date
+        s = (
+            to_tsdate(datetime.now() - timedelta(days=365 * 2))
+            if start_date is None
+            else start_date
+        )
+        first_day = to_pydate(s)
+        # 需要补齐均线时直接向前多取一段数据, 一次请求同时取回计算均线所需的历史行情
+        daily = get_proxy().daily(
+            ts_code=ts_code,
+            start_date=to_tsdate(first_day - warmup) if fill_mav else s,
+            end_date=e,
+        )
+    else:
+        first_day = pd.to_datetime(str(daily["trade_date"].min()), format="%Y%m%d")
+
+        if fill_mav:
+            prev_daily = (
+                get_proxy()
+                .daily(
+                    ts_code=daily["ts_code"].iloc[0],
+                    start_date=to_tsdate(first_day - warmup),
+                    end_date=to_tsdate(first_day),
+                )
+                # 显式按交易日升序排列后, 最后一行为first_day当天, 与daily重复
+                .sort_values("trade_date", kind="stable")
+                .iloc[-max(mavs) : -1]
+            )
 
-        daily = pd.concat([daily, prev_daily], ignore_index=True)
+            daily = pd.concat([daily, prev_daily], ignore_index=True)
 
+    # 补齐均线数据后只对合并后的交易日做一次日期转换
     daily = (
-        daily.copy()
-        .set_index(pd.to_datetime(daily["trade_date"], format="%Y%m%d"))
+        daily.set_index(pd.to_datetime(daily["trade_date"].to_numpy(), format="%Y%m%d"))
         .drop(columns=["trade_date"])
         .sort_index(ascending=True)
     )
 
     for window in mavs:
-        daily[f"MA{window}"] = daily["close"].rolling(window=window).mean()
-    daily = daily.loc[dates.min() :]
+        # 补齐均线时使用完整窗口的均值; 不补齐时, 开头不足window天的部分使用已有天数的均值
+        daily[f"MA{window}"] = (
+            daily["close"]
+            .rolling(window=window, min_periods=None if fill_mav else 1)
+            .mean()
+        )
+    daily = daily.loc[first_day:]
 
     fig = make_subplots(
         rows=2,
@@ -153,10 +169,9 @@ def plot_candle(
         )
 
     # 成交量
-    colors = [
-        "#2CA453" if close <= open else "#E3342F"
-        for close, open in zip(daily["close"], daily["open"])
-    ]
+    colors = np.where(
+        daily["close"].to_numpy() <= daily["open"].to_numpy(), "#2CA453", "#E3342F"
+    ).tolist()
 
     fig.add_trace(
         row=2,
@@ -189,16 +204,12 @@ def plot_candle(
     fig.update_yaxes(title_text="股价", row=1, col=1, fixedrange=True)
     fig.update_yaxes(title_text="成交量(手)", row=2, col=1, fixedrange=True)
 
+    # 非交易日不在图中显示
+    all_days = pd.date_range(daily.index[0], daily.index[-1], freq="D")
     fig.update_xaxes(
         title_text="日期",
         rangeslider_visible=True,
-        rangebreaks=[
-            dict(
-                values=pd.date_range(dates.min(), dates.max(), freq="D").difference(
-                    daily.index
-                )
-            )
-        ],
+        rangebreaks=[dict(values=all_days[~all_days.isin(daily.index)])],
         rangeselector=dict(
             buttons=[
                 dict(count=1, label="1M", step="month", stepmode="backward"),
@@ -0,0 +1,49 @@
+"""
+progress.py 提供了统一样式的进度条
+
+    @Time    : 2026/10/14
+    @Author  : JackWang
+    @File    : progress.py
+    @IDE     : VsCode
+    @Copyright Copyright Shihong Wang (c) 2025 with GNU Public License V3.0
+"""
+
+# Standard Library
+
+# Third-Party Library
+from rich.progress import (
+    Progress,
+    BarColumn,
+    TimeRemainingColumn,
+    TimeElapsedColumn,
+    TextColumn,
+)
+
+# Torch Library
+
+# My Library
+
+
+def default_progress(transient: bool = True, refresh_per_second: float = 4) -> Progress:
+    """
+    default_progress 创建项目统一样式的进度条
+
+    Args:
+        transient (bool, optional): 进度条完成后是否从终端清除. 默认为True.
+        refresh_per_second (float, optional): 每秒刷新终端的次数, 通过SSH使用时刷新终端的开销较大. 默认为4.
+
+    Returns:
+        Progress: 进度条
+    """
+    return Progress(
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TextColumn(
+            "[progress.percentage]{task.percentage:>3.0f}% [{task.completed:>4d}/{task.total}]"
+        ),
+        TimeRemainingColumn(),
+        TimeElapsedColumn(),
+        expand=True,
+        transient=transient,
+        refresh_per_second=refresh_per_second,
+    )
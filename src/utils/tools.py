@@ -9,120 +9,209 @@ tools.py 提供了一系列方便分析股票的工具
 """
 
 # Standard Library
-from typing import Optional
-from collections.abc import Callable
+from typing import Optional, Iterable
+from functools import lru_cache
 from datetime import date, datetime, timedelta
 
 # Third-Party Library
+import numpy as np
 import pandas as pd
 
 # Torch Library
 
 # My Library
-from .config import load_config
-from ..core.tushare_proxy import TuShareProxy
+from ..core.tushare_proxy import get_proxy
 
-config = load_config()
-proxy = TuShareProxy(config)
+# 预先构造的一天, 与整数相乘比每次调用timedelta(days=...)解析关键字参数更快
+_ONE_DAY = timedelta(days=1)
 
 
-def _get_tscode_name_symbol_convert() -> (
-    Callable[[str, str, str], tuple[str, str, str]]
-):
-    listed_shares = proxy.listed_shares()
-
-    def tscode_name_symbol_convert(
-        ts_code: Optional[str] = None,
-        name: Optional[str] = None,
-        symbol: Optional[str] = None,
-    ) -> tuple[str, str, str]:
-        assert ts_code is not None or name is not None or symbol is not None
-        if ts_code is not None:
-            shares = listed_shares.set_index("ts_code")
-            name = shares.loc[ts_code]["name"]
-            symbol = shares.loc[ts_code]["symbol"]
-        elif name is not None:
-            shares = listed_shares.set_index("name")
-            ts_code = shares.loc[name]["ts_code"]
-            symbol = shares.loc[name]["symbol"]
-        elif symbol is not None:
-            shares = listed_shares.set_index("symbol")
-            ts_code = shares.loc[symbol]["ts_code"]
-            name = shares.loc[symbol]["name"]
-        return ts_code, name, symbol
-
-    return tscode_name_symbol_convert
-
-
-_tscode_name_symbol_converter = _get_tscode_name_symbol_convert()
+def __getattr__(name: str):
+    """模块属性proxy在第一次访问时才创建TuShareProxy, 导入模块时不访问配置和网络"""
+    if name == "proxy":
+        return get_proxy()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@lru_cache(maxsize=1)
+def _get_share_lookups() -> tuple[dict[str, tuple[str, str, str]], ...]:
+    """构建ts_code/name/symbol到(ts_code, name, symbol)的查找表, 只在第一次使用时构建一次"""
+    listed_shares = get_proxy().listed_shares(fields="ts_code,name,symbol")
+    shares = list(
+        zip(listed_shares["ts_code"], listed_shares["name"], listed_shares["symbol"])
+    )
+    return (
+        {share[0]: share for share in shares},
+        {share[1]: share for share in shares},
+        {share[2]: share for share in shares},
+    )
 
 
+def _tscode_name_symbol_convert(
+    ts_code: Optional[str] = None,
+    name: Optional[str] = None,
+    symbol: Optional[str] = None,
+) -> tuple[str, str, str]:
+    assert ts_code is not None or name is not None or symbol is not None
+    by_tscode, by_name, by_symbol = _get_share_lookups()
+    if ts_code is not None:
+        return by_tscode[ts_code]
+    if name is not None:
+        return by_name[name]
+    return by_symbol[symbol]
+
+
+@lru_cache(maxsize=None)
 def tscode2name(ts_code: str) -> str:
     """tscode2name 将TuShare股票代码转换为股票名称"""
-    return _tscode_name_symbol_converter(ts_code=ts_code)[1]
+    return _tscode_name_symbol_convert(ts_code=ts_code)[1]
 
 
+@lru_cache(maxsize=None)
 def name2tscode(name: str) -> str:
     """name2tscode 将股票名称转换为TuShare股票代码"""
-    return _tscode_name_symbol_converter(name=name)[0]
+    return _tscode_name_symbol_convert(name=name)[0]
 
 
+@lru_cache(maxsize=None)
 def symbol2tscode(symbol: str) -> str:
     """symbol2tscode 将交易所股票代码转换为TuShare股票代码"""
-    return _tscode_name_symbol_converter(symbol=symbol)[0]
+    return _tscode_name_symbol_convert(symbol=symbol)[0]
 
 
+@lru_cache(maxsize=None)
 def tscode2symbol(ts_code: str) -> str:
     """tscode2symbol 将TuShare股票代码转换为交易所股票代码"""
-    return _tscode_name_symbol_converter(ts_code=ts_code)[2]
+    return _tscode_name_symbol_convert(ts_code=ts_code)[2]
 
 
+@lru_cache(maxsize=None)
 def name2symbol(name: str) -> str:
     """name2symbol 将股票名称转换为交易所股票代码"""
-    return _tscode_name_symbol_converter(name=name)[2]
+    return _tscode_name_symbol_convert(name=name)[2]
 
 
+@lru_cache(maxsize=None)
 def symbol2name(symbol: str) -> str:
     """symbol2name 将交易所股票代码转换为股票名称"""
-    return _tscode_name_symbol_converter(symbol=symbol)[1]
+    return _tscode_name_symbol_convert(symbol=symbol)[1]
+
+
+def _batch_convert(values: Iterable[str], source: int, target: int) -> list[str]:
+    """批量转换, source/target为(ts_code, name, symbol)中的位置, 每个元素只需一次字典查找"""
+    lookup = _get_share_lookups()[source]
+    return [lookup[value][target] for value in values]
+
+
+def tscodes2names(ts_codes: Iterable[str]) -> list[str]:
+    """tscodes2names 批量将TuShare股票代码转换为股票名称"""
+    return _batch_convert(ts_codes, 0, 1)
+
+
+def names2tscodes(names: Iterable[str]) -> list[str]:
+    """names2tscodes 批量将股票名称转换为TuShare股票代码"""
+    return _batch_convert(names, 1, 0)
+
+
+def symbols2tscodes(symbols: Iterable[str]) -> list[str]:
+    """symbols2tscodes 批量将交易所股票代码转换为TuShare股票代码"""
+    return _batch_convert(symbols, 2, 0)
+
+
+def tscodes2symbols(ts_codes: Iterable[str]) -> list[str]:
+    """tscodes2symbols 批量将TuShare股票代码转换为交易所股票代码"""
+    return _batch_convert(ts_codes, 0, 2)
+
+
+def names2symbols(names: Iterable[str]) -> list[str]:
+    """names2symbols 批量将股票名称转换为交易所股票代码"""
+    return _batch_convert(names, 1, 2)
+
+
+def symbols2names(symbols: Iterable[str]) -> list[str]:
+    """symbols2names 批量将交易所股票代码转换为股票名称"""
+    return _batch_convert(symbols, 2, 1)
+
+
+def invalidate_shares_cache() -> None:
+    """invalidate_shares_cache 清空股票列表查找表和转换结果的缓存, 下次转换时重新获取股票列表"""
+    _get_share_lookups.cache_clear()
+    for converter in (
+        tscode2name,
+        name2tscode,
+        symbol2tscode,
+        tscode2symbol,
+        name2symbol,
+        symbol2name,
+    ):
+        converter.cache_clear()
 
 
 def concat_df(
     df1: pd.DataFrame, df2: pd.DataFrame, remove_duplicates: bool = True
 ) -> pd.DataFrame:
     """concat_df 将两个DataFrame按列拼接，去除重复列"""
-    common_cols = set(df1.columns) & set(df2.columns)
-    df2_unique = df2.drop(columns=common_cols)
-    return pd.concat(
-        [df1, df2_unique if remove_duplicates else df2], axis=1, ignore_index=False
-    )
+    if remove_duplicates:
+        # 使用布尔掩码保留df2原有的列顺序, Index.difference会对列名排序
+        df2 = df2.loc[:, ~df2.columns.isin(df1.columns)]
+    return pd.concat([df1, df2], axis=1, ignore_index=False)
+
+
+def to_pydate(date_str: str) -> datetime:
+    """to_pydate 将YYYYMMDD格式的日期字符串转换为datetime, 固定格式直接切片, 比strptime快"""
+    return datetime(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8]))
+
+
+def to_tsdate(day: date | datetime) -> str:
+    """to_tsdate 将date/datetime转换为tushare使用的YYYYMMDD格式字符串"""
+    return f"{day.year:04d}{day.month:02d}{day.day:02d}"
+
+
+def _shift_dates(
+    dates: np.ndarray | pd.Index | pd.Series | list, days: int, return_str: bool
+) -> np.ndarray | pd.DatetimeIndex:
+    """批量将日期移动days天, 整列日期只转换一次, 使用向量化的datetime64运算"""
+    dates = pd.Index(dates)
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates.astype(str), format="%Y%m%d")
+    shifted = dates + pd.Timedelta(days=days)
+    return shifted.strftime("%Y%m%d").to_numpy() if return_str else shifted
+
+
+def _shift_day(day: date | datetime, days: int, return_str: bool) -> str | datetime:
+    """将单个日期移动days天, 只需要字符串时使用C实现的ordinal运算, 不构造timedelta"""
+    if return_str:
+        return to_tsdate(date.fromordinal(day.toordinal() + days))
+    # 返回日期对象时保留datetime的时间部分
+    return day + _ONE_DAY * days
 
 
 def get_relative_trade_day(
     relative_days: int,
-    start_date: Optional[str | date | datetime] = None,
-    end_date: Optional[str | date | datetime] = None,
+    start_date: Optional[str | date | datetime | np.ndarray | pd.Index] = None,
+    end_date: Optional[str | date | datetime | np.ndarray | pd.Index] = None,
     return_str: bool = True,
 ):
-    assert start_date is not None or end_date is not None
+    """
+    get_relative_trade_day 给定开始日期或者结束日期, 计算相隔relative_days天的日期
+
+    传入数组、列表、Index或者Series时批量计算, return_str为True时返回YYYYMMDD字符串数组, 否则返回DatetimeIndex
+    """
+    assert (start_date is None) != (
+        end_date is None
+    ), "start_date和end_date只能指定一个"
 
+    # 统一成(基准日期, 移动天数), 之后只需要一次类型判断
     if start_date is None:
-        end_date = (
-            datetime.strptime(end_date, "%Y%m%d")
-            if isinstance(end_date, str)
-            else end_date
-        )
-        start_date = end_date - timedelta(days=relative_days)
-        return start_date.strftime("%Y%m%d") if return_str else start_date
-
-    if end_date is None:
-        start_date = (
-            datetime.strptime(start_date, "%Y%m%d")
-            if isinstance(start_date, str)
-            else start_date
-        )
-        end_date = start_date + timedelta(days=relative_days)
-        return end_date.strftime("%Y%m%d") if return_str else end_date
+        anchor, days = end_date, -relative_days
+    else:
+        anchor, days = start_date, relative_days
+
+    if isinstance(anchor, str):
+        anchor = to_pydate(anchor)
+    elif not isinstance(anchor, date):
+        return _shift_dates(anchor, days, return_str)
+    return _shift_day(anchor, days, return_str)
 
 
 if __name__ == "__main__":